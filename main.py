@@ -3,91 +3,283 @@ import yfinance as yf
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+import httpx
+import orjson
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import io
 import os
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+if pa is not None:
+    # Arrow-backed strings are cheaper than Python-object columns for any
+    # string data coming out of yfinance
+    pd.options.mode.string_storage = 'pyarrow'
+
+try:
+    # Persists Yahoo responses to disk across app restarts and only fetches
+    # incremental updates for new trading days
+    import yfinance_cache as yfc
+except ImportError:
+    yfc = None
+
 # Set page configuration
 st.set_page_config(page_title="Stock Data Visualization", layout="wide")
 
+# Shared HTTP session with keep-alive so the TCP/TLS handshake is paid once,
+# not on every search; built under st.cache_resource because Streamlit
+# re-executes this script top to bottom on every rerun, and a bare
+# module-level Session would be rebuilt (and its pool discarded) each time
+@st.cache_resource(show_spinner=False)
+def _get_session():
+    session = requests.Session()
+    session.headers.update({'User-Agent': 'Mozilla/5.0'})
+    session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=10))
+    return session
+
+# HTTP/2 client for the Yahoo JSON endpoints: bursts of small requests
+# multiplex over a single TLS connection instead of queuing on HTTP/1.1
+# (yfinance needs a requests-compatible session, so _get_session stays for it)
+@st.cache_resource(show_spinner=False)
+def _get_client():
+    return httpx.Client(
+        http2=True,
+        headers={'User-Agent': 'Mozilla/5.0'},
+        timeout=5.0,
+        limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+    )
+
+_SESSION = _get_session()
+_CLIENT = _get_client()
+
 # Move selected_stocks outside of main() to make it persistent
+# (dict used as an ordered set: O(1) membership, insertion order preserved)
 if 'selected_stocks' not in st.session_state:
-    st.session_state.selected_stocks = []
+    st.session_state.selected_stocks = {}
+
+# Memoize Ticker objects: construction isn't free, and passing the shared
+# session lets them reuse the connection pool (st.cache_resource rather than
+# lru_cache so the memo isn't wiped when the function is redefined on rerun)
+@st.cache_resource(show_spinner=False)
+def _ticker(symbol):
+    if yfc is not None:
+        return yfc.Ticker(symbol)
+    return yf.Ticker(symbol, session=_SESSION)
+
+# fast_info quote fields mapped to the .info keys the UI expects. camelCase
+# works on both paths: yfinance's FastInfo accepts it, and yfinance-cache
+# exposes fast_info as a dict keyed only in camelCase
+_FAST_INFO_KEYS = {
+    "currentPrice": "lastPrice",
+    "marketCap": "marketCap",
+    "fiftyTwoWeekHigh": "yearHigh",
+    "fiftyTwoWeekLow": "yearLow",
+}
+
+# Helper to fetch quote info for one symbol; failures are contained per symbol
+# so one bad ticker doesn't kill the whole pool
+def _fetch_info(symbol):
+    ticker = _ticker(symbol)
+    info = {}
+    try:
+        # fast_info hits the lightweight quote endpoint instead of the
+        # heavyweight .info scrape
+        fast = ticker.fast_info
+    except Exception:
+        fast = None
+    if fast is not None:
+        for key, fast_key in _FAST_INFO_KEYS.items():
+            # Guard each key on its own so one missing field (e.g. no market
+            # cap for an index) doesn't drop the other quote values
+            try:
+                value = fast[fast_key]
+            except Exception:
+                continue
+            if value is not None:
+                info[key] = value
+    try:
+        # Ratio metrics (trailingPE, dividendYield, ...) only exist in the
+        # full .info payload; fast_info values take precedence where present
+        for key, value in ticker.info.items():
+            info.setdefault(key, value)
+    except Exception:
+        pass
+    return symbol, info
 
-# Function to fetch stock data
-def get_stock_data(symbols, period="1y"):
+# float32 keeps 6-7 significant figures, plenty for prices, at half the
+# memory, serialization and chart-upload cost of the float64 default.
+# Volume stays int64: daily volumes above ~2.1B shares would wrap int32
+_HISTORY_DTYPES = {
+    'Open': 'float32',
+    'High': 'float32',
+    'Low': 'float32',
+    'Close': 'float32',
+    'Volume': 'int64',
+    'Dividends': 'float32',
+    'Stock Splits': 'float32',
+}
+
+# Helper to fetch price history for one symbol through the disk cache
+def _fetch_history(symbol, period):
+    try:
+        return symbol, _ticker(symbol).history(period=period)
+    except Exception:
+        return symbol, pd.DataFrame()
+
+# Helper to fetch price history for all symbols
+def _fetch_histories(symbols, period):
+    if yfc is not None:
+        # Cached Tickers serve bars from disk; the network is only hit
+        # for trading days not yet cached
+        with ThreadPoolExecutor(max_workers=min(10, len(symbols))) as executor:
+            return dict(executor.map(lambda s: _fetch_history(s, period), symbols))
+    # Single batched request for all symbols instead of one round-trip each
+    raw = yf.download(' '.join(symbols), period=period, group_by='ticker', threads=True, progress=False)
+    # Recent yfinance returns MultiIndex columns even for a single ticker, so
+    # key off the column structure rather than the symbol count
+    if isinstance(raw.columns, pd.MultiIndex):
+        return {symbol: raw[symbol].dropna(how='all') for symbol in symbols}
+    return {symbol: raw for symbol in symbols}
+
+# Helper to fetch quote info for all symbols concurrently
+def _fetch_infos(symbols):
+    with ThreadPoolExecutor(max_workers=min(10, len(symbols))) as executor:
+        return dict(executor.map(_fetch_info, symbols))
+
+# Async driver that overlaps the history download with the quote-info fetch;
+# the two stages are independent network I/O, so total wall time is the
+# slower of the two rather than their sum
+async def _fetch_all(symbols, period):
+    return await asyncio.gather(
+        asyncio.to_thread(_fetch_histories, symbols, period),
+        asyncio.to_thread(_fetch_infos, symbols),
+    )
+
+# Raised when one or more symbols couldn't be fetched. The fetch helpers
+# swallow their own exceptions into empty results (yf.download does the same
+# per ticker internally), so get_stock_data raises this itself: a raising
+# call isn't memoized by st.cache_data, which keeps transient failures out
+# of the cache. Carries whatever was fetched so the caller can render it.
+class StockFetchError(Exception):
+    def __init__(self, failed, data):
+        super().__init__(f"Error fetching data for {', '.join(failed)}")
+        self.failed = failed
+        self.data = data
+
+# Function to fetch stock data (cached so widget reruns don't re-hit Yahoo;
+# failures raise so Streamlit doesn't cache a transient outage for the TTL)
+@st.cache_data(ttl=300, show_spinner=False)
+def get_stock_data(symbols, period="1y", columns=("Close", "Volume")):
     data = {}
+    failed = []
+    histories, infos = asyncio.run(_fetch_all(symbols, period))
     for symbol in symbols:
-        try:
-            stock = yf.Ticker(symbol)
-            hist = stock.history(period=period)
-            info = stock.info
-            data[symbol] = {"history": hist, "info": info}
-        except Exception as e:
-            st.error(f"Error fetching data for {symbol}: {str(e)}")
+        hist = histories.get(symbol, pd.DataFrame())
+        if hist.empty or 'Close' not in hist.columns:
+            failed.append(symbol)
+            continue
+        # Drop unused OHLCV columns: the chart only plots Close, and the
+        # narrower frame is cheaper to cache, render and serialize
+        if columns is not None:
+            hist = hist[[c for c in columns if c in hist.columns]]
+        hist = hist.astype({c: d for c, d in _HISTORY_DTYPES.items() if c in hist.columns},
+                           errors='ignore')
+        data[symbol] = {"history": hist, "info": infos.get(symbol, {})}
+    if failed:
+        raise StockFetchError(failed, data)
     return data
 
-# Function to create price history chart for multiple stocks
-def create_price_chart(data):
+# Figure construction cached on a compact fingerprint of the data; the frames
+# themselves are passed underscore-prefixed so Streamlit doesn't hash them.
+# The TTL matches get_stock_data's so the chart can't outlive the data it
+# was built from (the fingerprint alone misses same-day Close updates)
+@st.cache_resource(ttl=300, show_spinner=False)
+def _build_chart(data_key, _data):
     fig = go.Figure()
-    for symbol, stock_data in data.items():
-        fig.add_trace(go.Scatter(x=stock_data["history"].index, y=stock_data["history"]['Close'], mode='lines', name=f'{symbol} Close Price'))
+    for symbol, stock_data in _data.items():
+        close = stock_data["history"]['Close']
+        # Cap each trace at ~2000 points so long histories don't bog down the browser
+        step = max(1, len(close) // 2000)
+        if step > 1:
+            close = close.iloc[::step]
+        fig.add_trace(go.Scattergl(x=close.index, y=close, mode='lines', name=f'{symbol} Close Price'))
     fig.update_layout(title='Stock Price History', xaxis_title='Date', yaxis_title='Price (USD)')
     return fig
 
-# Function to search for stocks
+# Function to create price history chart for multiple stocks
+def create_price_chart(data):
+    data_key = tuple((symbol, len(sd["history"]),
+                      str(sd["history"].index[-1]) if len(sd["history"]) else '')
+                     for symbol, sd in data.items())
+    return _build_chart(data_key, data)
+
+# Function to search for stocks (cached so retyping the same query doesn't re-scrape)
+@st.cache_data(ttl=600, max_entries=256)
 def search_stocks(query):
-    url = f"https://finance.yahoo.com/lookup?s={query}"
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    response = requests.get(url, headers=headers)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    table = soup.find('table', {'class': 'lookup-table'})
-    
-    if table:
-        results = []
-        rows = table.find_all('tr')[1:]  # Skip header row
-        for row in rows[:10]:  # Limit to top 10 results
-            cols = row.find_all('td')
-            if len(cols) >= 2:
-                symbol = cols[0].text.strip()
-                name = cols[1].text.strip()
-                results.append({
-                    'symbol': symbol,
-                    'name': name,
-                    'exchange': 'N/A'  # Yahoo Finance lookup doesn't provide exchange info
-                })
-        return results
-    else:
+    query = query.strip().lower()
+    if len(query) < 2:  # Don't fire a request for single-character prefixes
         return []
+    # Yahoo's JSON autocomplete endpoint: no HTML to parse at all, and unlike
+    # the lookup page it reports the exchange
+    try:
+        response = _CLIENT.get(
+            'https://query2.finance.yahoo.com/v1/finance/search',
+            params={'q': query, 'quotesCount': 10, 'newsCount': 0},
+        )
+        response.raise_for_status()
+        quotes = orjson.loads(response.content).get('quotes', [])
+    except Exception:
+        # Degrade to no results on rate limits, timeouts or non-JSON bodies,
+        # like the old scrape did when the lookup table was missing
+        return []
+    return [{
+        'symbol': quote['symbol'],
+        'name': quote.get('shortname') or quote.get('longname', ''),
+        'exchange': quote.get('exchange', 'N/A'),
+    } for quote in quotes[:10] if 'symbol' in quote]
 
 # Function to display key metrics for multiple stocks
 def display_key_metrics(data):
     metrics = ["currentPrice", "marketCap", "trailingPE", "forwardPE", "dividendYield", "52WeekChange"]
     metric_names = ["Current Price", "Market Cap", "P/E Ratio (TTM)", "Forward P/E", "Dividend Yield", "52 Week Change"]
-    
-    df = pd.DataFrame(index=metric_names)
-    
-    for symbol, stock_data in data.items():
-        info = stock_data["info"]
-        values = []
-        for metric in metrics:
-            value = info.get(metric, 'N/A')
-            if metric == "currentPrice":
-                values.append(f"${value}" if isinstance(value, (int, float)) else str(value))
-            elif metric == "marketCap":
-                values.append(f"${value:,.0f}" if isinstance(value, (int, float)) else str(value))
-            elif metric in ["trailingPE", "forwardPE"]:
-                values.append(f"{value:.2f}" if isinstance(value, (int, float)) else str(value))
-            elif metric == "dividendYield":
-                values.append(f"{value:.2%}" if isinstance(value, (int, float)) else str(value))
-            elif metric == "52WeekChange":
-                values.append(f"{value:.2%}" if isinstance(value, (int, float)) else str(value))
-            else:
-                values.append(str(value))
-        df[symbol] = values
-    
+    formatters = {
+        "currentPrice": lambda v: f"${v}" if isinstance(v, (int, float)) else str(v),
+        "marketCap": lambda v: f"${v:,.0f}" if isinstance(v, (int, float)) else str(v),
+        "trailingPE": lambda v: f"{v:.2f}" if isinstance(v, (int, float)) else str(v),
+        "forwardPE": lambda v: f"{v:.2f}" if isinstance(v, (int, float)) else str(v),
+        "dividendYield": lambda v: f"{v:.2%}" if isinstance(v, (int, float)) else str(v),
+        "52WeekChange": lambda v: f"{v:.2%}" if isinstance(v, (int, float)) else str(v),
+    }
+
+    # Format before constructing the DataFrame so every column is born as
+    # strings; assigning formatted rows into numeric columns afterwards
+    # upcasts in place, which newer pandas disallows
+    df = pd.DataFrame(
+        {symbol: [formatters[metric](stock_data["info"].get(metric, 'N/A')) for metric in metrics]
+         for symbol, stock_data in data.items()},
+        index=metric_names)
+
     st.table(df)
 
+# Helper to serialize a history DataFrame to CSV bytes, cached so reruns
+# don't re-format the same frame
+@st.cache_data
+def _to_csv_bytes(df):
+    if pa is not None:
+        # pyarrow's CSV writer is multithreaded C++, several times faster
+        # than pandas on long histories
+        buf = io.BytesIO()
+        pa_csv.write_csv(pa.Table.from_pandas(df.reset_index()), buf)
+        return buf.getvalue()
+    return df.to_csv(index=True).encode()
+
 # Function to generate AI stock analysis
 
 # Main app
@@ -108,7 +300,7 @@ def main():
             )
             if st.button("Add Stock"):
                 if selected_stock not in st.session_state.selected_stocks:
-                    st.session_state.selected_stocks.append(selected_stock)
+                    st.session_state.selected_stocks[selected_stock] = None
                     st.success(f"Added {selected_stock} to the comparison list.")
                 else:
                     st.warning(f"{selected_stock} is already in the comparison list.")
@@ -119,13 +311,24 @@ def main():
     if st.session_state.selected_stocks:
         st.subheader("Currently Selected Stocks")
         st.write(", ".join(st.session_state.selected_stocks))
-        
+
+        full_ohlcv = st.checkbox("Include full OHLCV data (larger tables and downloads)")
+
         # Compare button
         if st.button("Compare Selected Stocks"):
             symbols = [stock.split(' - ')[0] for stock in st.session_state.selected_stocks]
-            
-            # Fetch stock data
-            stock_data = get_stock_data(symbols)
+
+            # Fetch stock data (sorted tuple keeps the cache key stable)
+            try:
+                stock_data = get_stock_data(tuple(sorted(symbols)), columns=None if full_ohlcv else ("Close", "Volume"))
+            except StockFetchError as e:
+                # Render the symbols that did fetch; since the raising call
+                # wasn't cached, clicking Compare again retries the rest
+                st.error(str(e))
+                stock_data = e.data
+            except Exception as e:
+                st.error(f"Error fetching stock data: {str(e)}")
+                stock_data = {}
             
             # Filter out symbols with no data
             valid_stock_data = {symbol: data for symbol, data in stock_data.items() if data}
@@ -149,7 +352,7 @@ def main():
                         st.dataframe(data["history"])
                         
                         # CSV download button
-                        csv = data["history"].to_csv(index=True)
+                        csv = _to_csv_bytes(data["history"])
                         st.download_button(
                             label=f"Download CSV for {symbol}",
                             data=csv,